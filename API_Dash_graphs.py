@@ -1,9 +1,15 @@
+import json
+import logging
+import os
 import plotly.express as px
 from dash import dcc, html, dash
 import numpy as np
 import pandas as pd
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from functools import lru_cache
 from assets.data_validation import DataValidation
+from assets.data_refresher import DataRefresher
+from assets.metrics import metrics, profile
 
 #---------------------------------------------
 # File: API_Dash_graphs.py
@@ -13,52 +19,142 @@ from assets.data_validation import DataValidation
 # Python ver: 3.9.7
 #---------------------------------------------
 
-# Load data
-total_plot_data, macev_taxongroup_colours, unique_measurementobject, historic_and_data= DataValidation().plotly_data()
+# Stage timings are logged as JSON lines, set MACEV_PROFILE_LOAD to a file path to write cProfile stats of the first data load (which then runs serially)
+logging.basicConfig(level=os.environ.get('MACEV_LOG_LEVEL', 'INFO'))
+
+# Seconds between background data refreshes and between checks of the dashboard for a new snapshot
+REFRESH_INTERVAL = 6 * 60 * 60
+STATUS_INTERVAL = 60
+
+# Years shown by the dashboard, only these are requested from the api (LAST_YEAR None is up to now)
+FIRST_YEAR = 2015
+LAST_YEAR = None
+
+# Build a bar figure of the totals (object None) or of one measurementobject, least recently used figures are evicted
+# The data version is part of the cache key so refreshed data never hits stale figures, the cache only holds figures and never a snapshot
+@lru_cache(maxsize=256)
+def build_figure(version, object, dropdown_value):
+    snapshot = refresher.snapshot
+    if object == None:
+        plot_data = snapshot.total_plot_data
+        title = dropdown_value
+    else:
+        plot_data = DataValidation().cube_location_per_year(snapshot.cube, object)
+        title = dropdown_value + ' meetobject: ' + str(object)
+    if dropdown_value == 'Relatieve Abundantie':
+        plot_data = DataValidation().relative_abundance(plot_data)
+        value_label = 'Relatieve Abundantie (%)'
+    else:
+        value_label = 'Totale Abundantie (n)'
+    return px.bar(plot_data, color_discrete_map=snapshot.macev_taxongroup_colours, title=title, template='simple_white', orientation='h', labels={'value': value_label, 'index': 'Jaar', 'Taxongroup': 'Taxongroep'})
+
+# Load data, then keep refreshing it in the background; figures of old snapshots are dropped on every refresh
+# With MACEV_SNAPSHOT_DIR set (see serve.py) the data is attached from the snapshot published by the parent process instead,
+# its published id is the data version so all workers report the same version
+# The api url and cache directory can be overridden with the DDECOAPI_URL and MACEV_CACHE_DIR environment variables, an empty MACEV_CACHE_DIR disables the cache
+if os.environ.get('MACEV_SNAPSHOT_DIR'):
+    from assets.shared_snapshot import SharedSnapshot
+    shared_snapshot = SharedSnapshot(os.environ['MACEV_SNAPSHOT_DIR'])
+    refresher = DataRefresher(shared_snapshot, interval=STATUS_INTERVAL, on_refresh=lambda snapshot: build_figure.cache_clear(), changed=shared_snapshot.changed, data_version=lambda: shared_snapshot.attached_id)
+else:
+    refresher = DataRefresher(DataValidation(cache_dir=os.environ.get('MACEV_CACHE_DIR', 'cache') or None, api_url=os.environ.get('DDECOAPI_URL', 'https://ddecoapi.aquadesk.nl/v2/'), lean=True, first_year=FIRST_YEAR, last_year=LAST_YEAR), interval=REFRESH_INTERVAL, on_refresh=lambda snapshot: build_figure.cache_clear())
+
+with profile(os.environ.get('MACEV_PROFILE_LOAD')):
+    refresher.refresh()
+refresher.start()
+
+# Status text of the loaded data
+def refresh_status():
+    if refresher.snapshot == None:
+        status = 'Data niet geladen'
+    else:
+        status = 'Laatst ververst: ' + refresher.snapshot.loaded_at.strftime('%d-%m-%Y %H:%M')
+    if refresher.refreshing:
+        status = status + ' (bezig met verversen)'
+    elif refresher.last_error != None:
+        status = status + ' (laatste verversing mislukt)'
+    return status
+
+# Subtitle with the range of years in the data
+def year_range_title(snapshot):
+    if snapshot == None or len(snapshot.total_plot_data) == 0:
+        return 'Perceel A t/m C'
+    return 'Perceel A t/m C, ' + snapshot.total_plot_data.index[0] + '-' + snapshot.total_plot_data.index[-1] + ' '
+
+# Dropdown options of the measurementobjects
+def object_options(snapshot):
+    if snapshot == None:
+        return []
+    return [{'label': i, 'value': i} for i in snapshot.unique_measurementobject]
+
+# Layout of a page, built on every page load so it shows the current snapshot
+def serve_layout():
+    snapshot = refresher.snapshot
+    return html.Div([
+            html.H1('Macroevertebraten Abundantie'),
+            html.H2(year_range_title(snapshot), id='year_range'),
+            dcc.RadioItems(id='abundance_radio', options= [{'label': 'Totale Abundantie', 'value':'Totale Abundantie'},{'label': 'Relatieve Abundantie', 'value': 'Relatieve Abundantie',}], value= 'Totale Abundantie', labelStyle={'display': 'inline-block'}, style=dict(display='flex', justifyContent='center')),
+            dcc.Graph(id= 'abundance_graph'),
+            html.P('Meetobject'),
+            dcc.Dropdown(id= 'object_dropdown', options=object_options(snapshot), value= snapshot.unique_measurementobject[0] if snapshot != None and len(snapshot.unique_measurementobject) > 0 else None),
+            dcc.Graph(id= 'object_graph'),
+            html.P(refresh_status(), id='refresh_status'),
+            dcc.Store(id='data_version', data=snapshot.version if snapshot != None else None),
+            dcc.Interval(id='refresh_interval', interval=STATUS_INTERVAL * 1000)
+            ])
 
 # Build App
 app = dash.Dash(__name__, title='MACEV Grafieken')
-app.layout =html.Div([
-        html.H1('Macroevertebraten Abundantie'),
-        html.H2('Perceel A t/m C, 2015-2021 '),
-        dcc.RadioItems(id='abundance_radio', options= [{'label': 'Totale Abundantie', 'value':'Totale Abundantie'},{'label': 'Relatieve Abundantie', 'value': 'Relatieve Abundantie',}], value= 'Totale Abundantie', labelStyle={'display': 'inline-block'}, style=dict(display='flex', justifyContent='center')),
-        dcc.Graph(id= 'abundance_graph'),
-        html.P('Meetobject'),
-        dcc.Dropdown(id= 'object_dropdown', options=[{'label': i, 'value': i} for i in unique_measurementobject], value= unique_measurementobject[0]),
-        dcc.Graph(id= 'object_graph')
-        ])
+app.layout = serve_layout
+
+@app.callback(
+    Output('refresh_status', 'children'),
+    Output('data_version', 'data'),
+    Output('object_dropdown', 'options'),
+    Output('year_range', 'children'),
+    Input('refresh_interval', 'n_intervals'),
+    State('data_version', 'data'),
+    )
+
+def refresh_update(n_intervals, data_version):
+    snapshot = refresher.snapshot
+    if snapshot == None or snapshot.version == data_version:
+        return refresh_status(), dash.no_update, dash.no_update, dash.no_update
+    return refresh_status(), snapshot.version, object_options(snapshot), year_range_title(snapshot)
 
 @app.callback(
     Output('abundance_graph', 'figure'),
     Input('abundance_radio', 'value'),
+    Input('data_version', 'data'),
     )
 
-def graph_total_update(dropdown_value):
-    fig = px.bar(total_plot_data, color_discrete_map=macev_taxongroup_colours, title='Totale Abundantie', template='simple_white', orientation='h', labels={'value': 'Totale Abundantie (n)', 'index': 'Jaar', 'Taxongroup': 'Taxongroep'})
-    fig1 = px.bar(total_plot_data.apply(lambda x: x*100/sum(x),axis=1), color_discrete_map=macev_taxongroup_colours, title='Relatieve Abundantie', template='simple_white', orientation='h', labels={'value': 'Relatieve Abundantie (%)', 'index': 'Jaar', 'Taxongroup': 'Taxongroep'})
-    if dropdown_value == 'Totale Abundantie':
-        return fig
-    elif dropdown_value == 'Relatieve Abundantie':
-        return fig1
+def graph_total_update(dropdown_value, data_version):
+    with metrics.timer('graph_total_update', mode=dropdown_value):
+        snapshot = refresher.snapshot
+        if snapshot != None and dropdown_value in ('Totale Abundantie', 'Relatieve Abundantie'):
+            return build_figure(snapshot.version, None, dropdown_value)
 
 @app.callback(
     Output('object_graph', 'figure'),
     Input('object_dropdown', 'value'),
     Input('abundance_radio', 'value'),
+    Input('data_version', 'data'),
     )
 
-def graph_object_update(dropdown_object, dropdown_value):
-    for object in unique_measurementobject:
-        if dropdown_value =='Totale Abundantie':
-            if object == dropdown_object:
-                object_plot_data = DataValidation().relative_data_location_per_year(historic_and_data, dropdown_object)
-                fig2 = px.bar(object_plot_data, color_discrete_map=macev_taxongroup_colours, title='Totale Abundantie meetobject: '+ str(dropdown_object), template='simple_white', orientation='h', labels={'value': 'Totale Abundantie (n)', 'index': 'Jaar', 'Taxongroup': 'Taxongroep'})
-                return fig2
-        if dropdown_value == 'Relatieve Abundantie':
-            if object == dropdown_object:
-                object_plot_data = DataValidation().relative_data_location_per_year(historic_and_data, dropdown_object)
-                fig3 = px.bar(object_plot_data.apply(lambda x: x*100/sum(x),axis=1), color_discrete_map=macev_taxongroup_colours, title='Relatieve Abundantie meetobject: '+ str(dropdown_object), template='simple_white', orientation='h', labels={'value': 'Relatieve Abundantie (%)', 'index': 'Jaar', 'Taxongroup': 'Taxongroep'})
-                return fig3
+def graph_object_update(dropdown_object, dropdown_value, data_version):
+    with metrics.timer('graph_object_update', object=dropdown_object, mode=dropdown_value):
+        snapshot = refresher.snapshot
+        if snapshot != None and dropdown_object in snapshot.unique_measurementobject and dropdown_value in ('Totale Abundantie', 'Relatieve Abundantie'):
+            return build_figure(snapshot.version, dropdown_object, dropdown_value)
+
+# Stage timings and counters of this process as JSON
+@app.server.route('/metrics')
+def metrics_endpoint():
+    body = dict(metrics.as_dict(), figure_cache=build_figure.cache_info()._asdict(), data_version=refresher.snapshot.version if refresher.snapshot != None else None)
+    return app.server.response_class(json.dumps(body), mimetype='application/json')
+
+# WSGI server of the app, used by serve.py
+server = app.server
 
 # Run app
 if __name__ == '__main__':
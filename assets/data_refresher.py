@@ -0,0 +1,96 @@
+import threading
+from collections import namedtuple
+from datetime import datetime
+from .metrics import metrics
+
+#---------------------------------------------
+# File: data_refresher.py
+# Author: Wouter Abels (wouter.abels@rws.nl)
+# Created: 18/10/26
+# Last modified: 18/10/26
+# Python ver: 3.9.7
+#---------------------------------------------
+
+### Immutable set of loaded data the dashboard reads from, hashed and compared on version only ###
+# historic_and_data is not kept, the dashboard only reads the totals and the cube
+class DataSnapshot(namedtuple('DataSnapshot', ['version', 'loaded_at', 'total_plot_data', 'macev_taxongroup_colours', 'unique_measurementobject', 'cube'])):
+    __slots__ = ()
+
+    def __hash__(self):
+        return hash(self.version)
+
+    def __eq__(self, other):
+        return isinstance(other, DataSnapshot) and self.version == other.version
+
+
+### Class that reloads the data in the background and swaps in a new snapshot ###
+class DataRefresher:
+
+    # Initialize refresher with the pipeline to run
+    # Args: data_validation (DataValidation): Pipeline of which plotly_data is run on every refresh
+    #       interval (int, optional): Seconds between refreshes. Defaults to 6 hours.
+    #       on_refresh (function, optional): Called with the new snapshot after a successful refresh. Defaults to None.
+    #       changed (function, optional): Returns True when new data is available, the scheduled refreshes are skipped otherwise. Defaults to None (always refresh).
+    #       data_version (function, optional): Returns the version of the data just loaded, e.g. the id of a shared snapshot so all processes agree. Defaults to None (count the refreshes of this process).
+    def __init__(self, data_validation, interval=6 * 60 * 60, on_refresh=None, changed=None, data_version=None):
+        self.data_validation = data_validation
+        self.interval = interval
+        self.on_refresh = on_refresh
+        self.changed = changed
+        self.data_version = data_version
+        self.snapshot = None
+        self.refreshing = False
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Run the pipeline and swap in the new snapshot, on failure the previous snapshot stays in place
+    # A failing on_refresh is recorded like a failed load, the new snapshot is kept
+    # Returns: Bool: True if a new snapshot was loaded and on_refresh succeeded
+    def refresh(self) -> bool:
+        with self._lock:
+            self.refreshing = True
+            try:
+                with metrics.timer('refresh'):
+                    total_plot_data, macev_taxongroup_colours, unique_measurementobject, _, cube = self.data_validation.plotly_data()
+                if self.data_version != None:
+                    version = self.data_version()
+                else:
+                    version = 1 if self.snapshot == None else self.snapshot.version + 1
+                snapshot = DataSnapshot(version, datetime.now(), total_plot_data, macev_taxongroup_colours, unique_measurementobject, cube)
+            except Exception as e:
+                self.last_error = e
+                metrics.increment('refresh_failures')
+                print(f'Error: data refresh failed, keeping previous data ({e})')
+                return False
+            finally:
+                self.refreshing = False
+            # A single attribute assignment, readers see either the old or the new snapshot
+            self.snapshot = snapshot
+            self.last_error = None
+        if self.on_refresh != None:
+            try:
+                self.on_refresh(snapshot)
+            except Exception as e:
+                self.last_error = e
+                metrics.increment('refresh_failures')
+                print(f'Error: on_refresh of data version {snapshot.version} failed ({e})')
+                return False
+        return True
+
+    # Start refreshing every interval seconds in a daemon thread
+    def start(self):
+        if self._thread == None:
+            self._thread = threading.Thread(target=self.run, name='data-refresher', daemon=True)
+            self._thread.start()
+
+    # Stop the background refreshes
+    def stop(self):
+        self._stop.set()
+
+    # Refresh every interval seconds until stopped, blocks the calling thread
+    def run(self):
+        while not self._stop.wait(self.interval):
+            if self.changed == None or self.changed():
+                self.refresh()
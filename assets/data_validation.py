@@ -1,8 +1,14 @@
+import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
 from .ddecoapidataparser import dataparser
-from .config import apiKey
+from .metrics import metrics, profiling
+try:
+    from .config import apiKey
+except ImportError:
+    apiKey = None
 
 #---------------------------------------------
 # File: data_validation.py
@@ -12,34 +18,101 @@ from .config import apiKey
 # Python ver: 3.9.7
 #---------------------------------------------
 
+# Column types of the checked measurements, calculatedvalue stays float64 because it is summed over many rows
+MEASUREMENT_SCHEMA = {
+    'collectiondate': 'datetime',
+    'measurementdate': 'datetime',
+    'measurementobject': 'category',
+    'measurementobjectname': 'category',
+    'parameter': 'category',
+    'name': 'category',
+    'taxongroup': 'category',
+    'name_tg': 'category',
+    'limitsymbol': 'category',
+    'taxonrank': 'category',
+    'parentname': 'category',
+    'synonymname': 'category',
+    'genus': 'category',
+    'statuscode': 'float',
+    'measuredvalue': 'float',
+    }
+
+# Measurement columns data_check needs, the columns of an empty historic data set
+MEASUREMENT_COLUMNS = ['id', 'measurementobject', 'measurementobjectname', 'collectiondate', 'measurementdate', 'parameter', 'calculatedvalue']
+
+# Columns of historic_and_data used by the dashboard
+DASHBOARD_COLUMNS = ['measurementobjectname', 'collectiondate', 'year', 'name_tg', 'calculatedvalue']
+
+# Measurement properties the dashboard does not use, skipped on top of the standard skip properties in the lean load profile
+LEAN_SKIP_PROPERTIES = ',externalreference,limitsymbol,measuredvalue,measurementsetnumber,classifiedvalue'
+
+# Number of historic object queries kept in flight at once
+HISTORIC_WORKERS = 4
+
 ### Class for Datavalidation ###
 class DataValidation:
 
+    # Initialize class with the api and the location of the query cache
+    # Args: cache_dir (str, optional): Directory for cached API results. Defaults to None (no cache).
+    #       reference_ttl (int, optional): Max age in seconds of the cached parameters and taxongroups. Defaults to one day.
+    #       measurement_ttl (int, optional): Seconds after which the cached measurements are fetched in full instead of incrementally, so corrections and deletions of older measurements are picked up. Defaults to one day.
+    #       stream (bool, optional): Parse the measurement pages incrementally to limit peak memory, interrupted measurement dumps are then not resumed from checkpoints. Defaults to False.
+    #       api_url (str, optional): Url of the DD-ECO api. Defaults to the aquadesk api.
+    #       api_key (str, optional): API key for identification as company. Defaults to apiKey of config.py.
+    #       lean (bool, optional): Only load what the dashboard uses: no ME.KG measurement_data and no unused measurement properties. Defaults to False.
+    #       first_year (int, optional): First year of the historic data. Defaults to 2015.
+    #       last_year (int, optional): Last year of the historic data, None loads everything up to now. Defaults to None.
+    #       page_size (int, optional): Max number of records per api page. Defaults to 1000000.
+    #       workers (int, optional): Number of pages of a measurement query kept in flight at once. Defaults to 4.
+    def __init__(self, cache_dir=None, reference_ttl=24 * 60 * 60, measurement_ttl=24 * 60 * 60, stream=False, api_url='https://ddecoapi.aquadesk.nl/v2/', api_key=None, lean=False, first_year=2015, last_year=None, page_size=1000000, workers=4):
+        self.cache_dir = cache_dir
+        self.reference_ttl = reference_ttl
+        self.measurement_ttl = measurement_ttl
+        self.stream = stream
+        self.api_url = api_url
+        self.api_key = api_key if api_key != None else apiKey
+        self.lean = lean
+        self.first_year = first_year
+        self.last_year = last_year
+        self.page_size = page_size
+        self.workers = workers
 
     # Load data form api and merge dataframes     
     def data_load(self):
 
         # Call api key values
-        api_key = apiKey
-        # configure api url
-        ddecoapi = dataparser('https://ddecoapi.aquadesk.nl/v2/')
+        api_key = self.api_key
+        # configure api url, page checkpoints of interrupted dumps are kept next to the cache
+        checkpoint_dir = os.path.join(self.cache_dir, 'checkpoints') if self.cache_dir != None else None
+        # The pool holds a connection for every page in flight of the parallel historic queries
+        ddecoapi = dataparser(self.api_url, pool_size=max(10, HISTORIC_WORKERS * self.workers), cache_dir=self.cache_dir, checkpoint_dir=checkpoint_dir, checkpoint_ttl=self.measurement_ttl)
+        lean_skip_properties = LEAN_SKIP_PROPERTIES if self.lean else ''
 
         # Get filtered dataframe of requested data
         # To Do - Add Skip properties
         # Link for Filters: https://github.com/DigitaleDeltaOrg/dd-eco-api/blob/main/filtering.md
-        data = ddecoapi.parse_data_dump(query_url = 'measurements', query_filter = 'measurementdate:ge:"2021-04-01";taxontype:eq:"MACEV"', api_key = api_key, skip_properties='calculatedunit,changedate,compartment,measuredunit,measurementpackage,measurementpurpose,measurementattributes,organisation,parametertype,projects,analysiscontext,samplingcontext,quantity,taxontype,externalkey,sourcesystem,supplier,organisationnumericcode,suppliernumericcode,watertypes,locationgeography.coordinates,locationgeography.type,locationgeography.srid,measurementgeography.coordinates,measurementgeography.type,measurementgeography.srid')
-        measurement_data = ddecoapi.parse_data_dump(query_url= 'measurements', query_filter = 'measurementdate:ge:"2021-04-01";measurementpackage:eq:"ME.KG"', api_key = api_key, skip_properties='limitsymbol,measurementpurpose,organisation,projects,analysiscontext,samplingcontext,measurementsetnumber,externalkey,sourcesystem,supplier,organisationnumericcode,suppliernumericcode,watertypes,locationgeography.coordinates,locationgeography.type,locationgeography.srid,measurementgeography.coordinates,measurementgeography.type,measurementgeography.srid,parameter,parametertype,classifiedvalue')
+        # The current data is limited to the displayed years, it is loaded in full when those years end before it because the measurementobjects are taken from it
+        if self.last_year != None and self.last_year < 2021:
+            current_filter = 'measurementdate:ge:"2021-04-01"'
+        else:
+            current_filter = self.date_filter(max('2021-04-01', str(self.first_year) + '-01-01'))
+        data = ddecoapi.cached_data_dump(query_url = 'measurements', query_filter = current_filter + ';taxontype:eq:"MACEV"', api_key = api_key, page_size=self.page_size, workers=self.workers, refresh_column='measurementdate', ttl=self.measurement_ttl, stream=self.stream, skip_properties='calculatedunit,changedate,compartment,measuredunit,measurementpackage,measurementpurpose,measurementattributes,organisation,parametertype,projects,analysiscontext,samplingcontext,quantity,taxontype,externalkey,sourcesystem,supplier,organisationnumericcode,suppliernumericcode,watertypes,locationgeography.coordinates,locationgeography.type,locationgeography.srid,measurementgeography.coordinates,measurementgeography.type,measurementgeography.srid' + lean_skip_properties)
+        if self.lean:
+            measurement_data = pd.DataFrame()
+        else:
+            measurement_data = ddecoapi.cached_data_dump(query_url= 'measurements', query_filter = 'measurementdate:ge:"2021-04-01";measurementpackage:eq:"ME.KG"', api_key = api_key, page_size=self.page_size, workers=self.workers, refresh_column='measurementdate', ttl=self.measurement_ttl, skip_properties='limitsymbol,measurementpurpose,organisation,projects,analysiscontext,samplingcontext,measurementsetnumber,externalkey,sourcesystem,supplier,organisationnumericcode,suppliernumericcode,watertypes,locationgeography.coordinates,locationgeography.type,locationgeography.srid,measurementgeography.coordinates,measurementgeography.type,measurementgeography.srid,parameter,parametertype,classifiedvalue')
 
-        data_measurementobjects = pd.unique(data['measurementobject'])
-        data_historic = []
-        for object in data_measurementobjects:
-            filter = 'taxontype:eq:"MACEV";measurementdate:ge:"2015-01-01";measurementobject:eq:' + "'" + object + "'"
-            data_measurementobject = ddecoapi.parse_data_dump(query_url= 'measurements', query_filter= filter  , api_key = api_key,skip_properties='calculatedunit,changedate,compartment,measuredunit,,measurementpackage,measurementpurpose,measurementattributes,organisation,parametertype,projects,analysiscontext,samplingcontext,quantity,taxontype,measurementsetnumber,externalkey,sourcesystem,supplier,organisationnumericcode,suppliernumericcode,watertypes,locationgeography.coordinates,locationgeography.type,locationgeography.srid,measurementgeography.coordinates,measurementgeography.type,measurementgeography.srid')
-            data_historic = data_measurementobject.append(data_historic)
+        # Without current data there are no measurementobjects to load, the dashboard then shows empty graphs
+        if len(data) == 0:
+            print(f'Warning: no current measurements between {self.first_year} and {self.last_year if self.last_year != None else "now"}')
+            data_measurementobjects = []
+        else:
+            data_measurementobjects = pd.unique(data['measurementobject'])
+        data_historic = self.historic_load(ddecoapi, api_key, data_measurementobjects, lean_skip_properties)
 
         # Load twn data and taxongroup names
-        twn = ddecoapi.parse_data_dump(query_url = 'parameters', query_filter = 'parametertype:eq:"TAXON";taxontype:eq:"MACEV"', api_key = api_key, skip_properties='code,changedate,externalkey,parametertype,taxonmaintype,taxontype,authors,parentauthors,literature,standards,synonymauthors')
-        taxongroups = ddecoapi.parse_data_dump(query_url = 'taxongroups', api_key = api_key, skip_properties='maintypename,changedate,externalkey')
+        twn = ddecoapi.cached_data_dump(query_url = 'parameters', query_filter = 'parametertype:eq:"TAXON";taxontype:eq:"MACEV"', api_key = api_key, page_size=self.page_size, ttl=self.reference_ttl, skip_properties='code,changedate,externalkey,parametertype,taxonmaintype,taxontype,authors,parentauthors,literature,standards,synonymauthors')
+        taxongroups = ddecoapi.cached_data_dump(query_url = 'taxongroups', api_key = api_key, page_size=self.page_size, ttl=self.reference_ttl, skip_properties='maintypename,changedate,externalkey')
 
         # Merge twn data and taxongroup names
         twn = twn.merge(taxongroups, how = 'left', left_on = 'taxongroup', right_on = 'code', suffixes = (None, '_tg'))
@@ -48,46 +121,85 @@ class DataValidation:
         return data, data_historic, twn, taxongroups, measurement_data
 
     
+    # Returns the api filter of the measurements from first_date up to the end of last_year
+    # Args: first_date (str): First measurementdate, e.g. '2015-01-01'
+    def date_filter(self, first_date):
+        date_filter = 'measurementdate:ge:"' + first_date + '"'
+        if self.last_year != None:
+            date_filter = date_filter + ';measurementdate:lt:"' + str(self.last_year + 1) + '-01-01"'
+        return date_filter
+
+    # Load historic data of the given measurementobjects, queries run in parallel and are concatenated once
+    # Args: ddecoapi (dataparser): Parser of the api
+    #       api_key (str): API key for identification as company
+    #       measurementobjects (list): Measurementobject codes to load the history for
+    #       extra_skip_properties (str, optional): Appended to the skip properties, starting with a comma. Defaults to ''.
+    #       workers (int, optional): Number of object queries kept in flight at once, 1 while profiling. Defaults to 4.
+    # Returns: pd.DataFrame: historic data of all measurementobjects between first_year and last_year
+    def historic_load(self, ddecoapi, api_key, measurementobjects, extra_skip_properties='', workers=HISTORIC_WORKERS):
+        date_filter = self.date_filter(str(self.first_year) + '-01-01')
+
+        def object_load(object):
+            filter = 'taxontype:eq:"MACEV";' + date_filter + ';measurementobject:eq:' + "'" + object + "'"
+            return ddecoapi.cached_data_dump(query_url= 'measurements', query_filter= filter  , api_key = api_key, page_size=self.page_size, workers=self.workers, refresh_column='measurementdate', ttl=self.measurement_ttl, stream=self.stream, skip_properties='calculatedunit,changedate,compartment,measuredunit,,measurementpackage,measurementpurpose,measurementattributes,organisation,parametertype,projects,analysiscontext,samplingcontext,quantity,taxontype,measurementsetnumber,externalkey,sourcesystem,supplier,organisationnumericcode,suppliernumericcode,watertypes,locationgeography.coordinates,locationgeography.type,locationgeography.srid,measurementgeography.coordinates,measurementgeography.type,measurementgeography.srid' + extra_skip_properties)
+
+        if len(measurementobjects) == 0:
+            return pd.DataFrame(columns=MEASUREMENT_COLUMNS)
+
+        # cProfile only sees the calling thread, the queries run there while profiling
+        if profiling.is_set():
+            data_historic = list(map(object_load, measurementobjects))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                data_historic = list(executor.map(object_load, measurementobjects))
+        return pd.concat(data_historic, ignore_index=True)
+
     # Check and modify data before validation
     def data_check(self):
     
         # Load data from data_load_test function
-        data, data_historic, twn, taxongroups, measurement_data = DataValidation().data_load()
+        with metrics.timer('data_load'):
+            data, data_historic, twn, taxongroups, measurement_data = self.data_load()
 
-        # Add historic data to current data for complete data set
-        historic_and_data = data_historic.append(data)
+        # The historic data of the measurementobjects already holds the current data, the current rows (measured from 2021-04-01) are marked to split them off after cleaning
+        current = data_historic['measurementdate'].astype('string').str.slice(0, 10) >= '2021-04-01'
+        historic_and_data = data_historic.assign(current=current.fillna(False).astype(bool))
 
-        # Check for limitsymbol if True then replace 0 measured value to 1
-        data['measuredvalue'] = np.where(((data.limitsymbol == '>') & (data.measuredvalue == 0.0)), 1, data.measuredvalue)
-        historic_and_data['measuredvalue'] = np.where(((historic_and_data.limitsymbol == '>') & (historic_and_data.measuredvalue == 0.0)), 1, historic_and_data.measuredvalue)
+        # Only keep the displayed years, the year is taken from the local collection date before the dates are converted to UTC
+        historic_and_data['year'] = self.local_year(historic_and_data['collectiondate'])
+        in_year_range = historic_and_data['year'] >= self.first_year
+        if self.last_year != None:
+            in_year_range = in_year_range & (historic_and_data['year'] <= self.last_year)
+        historic_and_data = historic_and_data[in_year_range.fillna(False).astype(bool)].reset_index(drop=True)
+
+        # Check for limitsymbol if True then replace 0 measured value to 1, both are skipped in the lean load profile
+        if 'limitsymbol' in historic_and_data.columns:
+            historic_and_data.loc[(historic_and_data.limitsymbol == '>') & (historic_and_data.measuredvalue == 0.0), 'measuredvalue'] = 1
 
         # Makesure the values in the externalreference(collectienummer) and id column are string type values
-        data['externalreference'] = data['externalreference'].astype(str)
-        data['id'] = data['id'].astype(str)
-        historic_and_data['externalreference'] = historic_and_data['externalreference'].astype(str)
-        historic_and_data['id'] = historic_and_data['id'].astype(str)
+        for column in ['externalreference', 'id']:
+            if column in historic_and_data.columns:
+                historic_and_data[column] = historic_and_data[column].astype(str)
 
         # Merge data and twn
-        data = data.merge(twn, how='left', left_on='parameter', right_on='name', suffixes = (None, '_twn'))
-        historic_and_data = historic_and_data.merge(twn, how='left', left_on='parameter', right_on='name', suffixes = (None, '_twn'))
+        with metrics.timer('data_check.merge_twn', rows=len(historic_and_data)):
+            historic_and_data = historic_and_data.merge(twn, how='left', left_on='parameter', right_on='name', suffixes = (None, '_twn'))
 
         # Add group for rows where taxongroup is empty
-        data['taxongroup'] = data['taxongroup'].astype(str)
-        data['taxongroup'] = np.where((data.taxongroup == 'nan'), 'no_group', data.taxongroup)
-        data_historic['taxongroup'] = data_historic['taxongroup'].astype(str)
-        data_historic['taxongroup'] = np.where((data_historic.taxongroup == 'nan'), 'no_group', data_historic.taxongroup)
+        historic_and_data['taxongroup'] = historic_and_data['taxongroup'].fillna('no_group').astype(str)
 
         # Check statuscode if 20 replace name with parentname
-        data['parameter'] = np.where((data.statuscode == 20), data.synonymname, data.parameter)
-        historic_and_data['parameter'] = np.where((historic_and_data.statuscode == 20), historic_and_data.synonymname, historic_and_data.parameter)
+        synonyms = historic_and_data.statuscode == 20
+        historic_and_data.loc[synonyms, 'parameter'] = historic_and_data.loc[synonyms, 'synonymname']
 
         # Check for genus and add a column with higher genus information
-        data['genus'] = data['parameter']
-        data['genus'] = np.where((data.taxonrank == 'Species'), data.parentname, data.genus)
-        data['genus'] = np.where((data.taxonrank == 'SpeciesCombi'), data.parentname, data.genus)
-        historic_and_data['genus'] = historic_and_data['parameter']
-        historic_and_data['genus'] = np.where((historic_and_data.taxonrank == 'Species'), historic_and_data.parentname, historic_and_data.genus)
-        historic_and_data['genus'] = np.where((historic_and_data.taxonrank == 'SpeciesCombi'), historic_and_data.parentname, historic_and_data.genus)
+        historic_and_data['genus'] = historic_and_data['parameter'].where(~historic_and_data.taxonrank.isin(['Species', 'SpeciesCombi']), historic_and_data.parentname)
+
+        # Split the current data off the cleaned data set and store it compact: dates, categoricals and downcast numerics
+        current = historic_and_data.pop('current')
+        with metrics.timer('data_check.normalise_dtypes', rows=len(historic_and_data)):
+            historic_and_data = dataparser.normalise_dtypes(historic_and_data, MEASUREMENT_SCHEMA)
+        data = historic_and_data[current]
 
         # Return checked data
         return  data, historic_and_data, data_historic, twn, taxongroups, measurement_data
@@ -125,51 +237,80 @@ class DataValidation:
             }
         return macev_taxongroup_colours
 
-    # Divide dataset per year and calculate relative distribution per year, return te values from series to a dataframe and reset the first column to index and add column titles remove empty columns with only 0 values
+    # Year of the local date of ISO date strings, taken from the string itself so a UTC offset can not move a sample to another year
+    # Dates that are already parsed are taken as they are
+    @staticmethod
+    def local_year(dates):
+        if pd.api.types.is_datetime64_any_dtype(dates):
+            return dates.dt.year.astype('Int64')
+        return pd.to_numeric(dates.astype('string').str.slice(0, 4), errors='coerce').astype('Int64')
+
+    # Sum the data per year and taxongroup in a single groupby on the parsed year column, the years come from the data
+    # Returns the year x taxongroup frame without years with only 0 values
     def value_per_year(self, relative_data_location_year):
-        years = ['2000','2001','2002','2003','2004','2005','2006','2007','2008','2009','2010','2011','2012','2013','2014','2015','2016','2017','2018','2019','2020','2021','2022']
-        dataperyear = {}
-        for year in years:
-            dataperyear[year] = relative_data_location_year[relative_data_location_year['collectiondate']\
-                .str\
-                .contains(year)]\
-                .groupby('name_tg')['calculatedvalue']\
-                .sum()\
-                .astype(int)\
-                .to_frame()\
-                .rename_axis('Taxongroup')\
-                .rename(columns={'calculatedvalue':year})
-        dataperyear = pd.concat(dataperyear, join='outer', axis=1)\
-            .fillna(0)\
-            .astype(int)
-        dataperyear = dataperyear.loc[:, (dataperyear!=0)\
-            .any(axis=0)]
-        dataperyear.columns = dataperyear.columns.droplevel()
-        dataperyear = dataperyear.T
+        with metrics.timer('value_per_year', rows=len(relative_data_location_year)):
+            years = relative_data_location_year['year'] if 'year' in relative_data_location_year.columns else self.local_year(relative_data_location_year['collectiondate'])
+            dataperyear = relative_data_location_year\
+                .groupby([years.rename('year'), 'name_tg'], observed=True)['calculatedvalue']\
+                .sum()
+            dataperyear = self.cube_to_plot_data(dataperyear)
         return dataperyear
 
-    # Divide data per location
+    # Divide data per location, the measurementobjectname has to match exactly
     def data_location(self, historic_and_data, object):
-        datalocation = historic_and_data[historic_and_data["measurementobjectname"].str.contains(object)]
+        datalocation = historic_and_data[historic_and_data["measurementobjectname"] == object]
         return datalocation
 
     # Calls 2 functions and calculates the relative values of de resulting dataframe 
-    def relative_data_location_per_year(self, object, historic_and_data):
-        relative_data_location_year = DataValidation().data_location(object, historic_and_data) 
-        relative_data_location_year = DataValidation().value_per_year(relative_data_location_year)
-        relative_data_location_year = relative_data_location_year
+    def relative_data_location_per_year(self, historic_and_data, object):
+        relative_data_location_year = self.data_location(historic_and_data, object)
+        relative_data_location_year = self.value_per_year(relative_data_location_year)
         return relative_data_location_year
 
+    # Sum calculatedvalue per measurementobject, year and taxongroup in a single groupby on a parsed year column
+    def aggregate_cube(self, historic_and_data):
+        with metrics.timer('aggregate_cube', rows=len(historic_and_data)):
+            cube = historic_and_data\
+                .groupby(['measurementobjectname', 'year', 'name_tg'], observed=True)['calculatedvalue']\
+                .sum()
+        return cube
+
+    # Turn a (year, name_tg) series of the cube into the year x taxongroup frame of value_per_year, remove years with only 0 values
+    def cube_to_plot_data(self, cube_per_year):
+        dataperyear = cube_per_year.groupby(level=['year', 'name_tg'])\
+            .sum()\
+            .astype(int)\
+            .unstack('name_tg', fill_value=0)\
+            .rename_axis(index=None, columns='Taxongroup')
+        dataperyear = dataperyear.loc[(dataperyear!=0)\
+            .any(axis=1)]
+        dataperyear.index = dataperyear.index.astype(str)
+        return dataperyear
+
+    # Look up the values per year of a single measurementobject in the cube, the sorted cube index is the exact-match index per object and year
+    def cube_location_per_year(self, cube, object):
+        try:
+            return self.cube_to_plot_data(cube.xs(object, level='measurementobjectname'))
+        except KeyError:
+            return pd.DataFrame()
+
+    # Calculate the relative distribution (%) per year of a year x taxongroup frame
+    def relative_abundance(self, plot_data):
+        return plot_data.div(plot_data.sum(axis=1), axis=0) * 100
+
     # Plot relative counts per taxon groups
     def plot_total_abundance(self):
-        data, historic_and_data, data_historic, twn, taxongroups, measurement_data = DataValidation().data_check()
-        macev_taxongroup_colours = DataValidation().set_data_colours()
-        total_plot_data = DataValidation().value_per_year(historic_and_data)#.apply(lambda x: x*100/sum(x),axis=1)
+        data, historic_and_data, data_historic, twn, taxongroups, measurement_data = self.data_check()
+        macev_taxongroup_colours = self.set_data_colours()
+        total_plot_data = self.value_per_year(historic_and_data)#.apply(lambda x: x*100/sum(x),axis=1)
         return total_plot_data, macev_taxongroup_colours
     
+    # Only the dashboard columns of the checked data are kept, the other loaded frames are released before aggregating
     def plotly_data(self):
-        data, historic_and_data, data_historic, twn, taxongroups, measurement_data = DataValidation().data_check()
-        macev_taxongroup_colours = DataValidation().set_data_colours()
-        total_plot_data = DataValidation().value_per_year(historic_and_data)
-        unique_measurementobject = np.sort(pd.unique(historic_and_data['measurementobjectname']))
-        return total_plot_data, macev_taxongroup_colours, unique_measurementobject, historic_and_data
\ No newline at end of file
+        historic_and_data = dataparser.normalise_dtypes(self.data_check()[1], {}, keep_columns=DASHBOARD_COLUMNS)
+        macev_taxongroup_colours = self.set_data_colours()
+        cube = self.aggregate_cube(historic_and_data)
+        total_plot_data = self.cube_to_plot_data(cube)
+        unique_measurementobject = np.sort(historic_and_data['measurementobjectname'].dropna().unique().astype(str))
+        return total_plot_data, macev_taxongroup_colours, unique_measurementobject, historic_and_data, cube
+
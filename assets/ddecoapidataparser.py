@@ -1,6 +1,22 @@
 import pandas as pd
 import numpy as np
 import requests
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from .metrics import metrics, profiling
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# HTTP status codes of transient api errors that are retried
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
 
 # ***
 # File: dataparser_ddeco.py
@@ -12,22 +28,48 @@ import requests
 
 class dataparser:
 
-    # Initialize class to save a API url as variable
+    # Initialize class to save a API url as variable and open a pooled HTTP session
     # Args: api_url (str, optional): Standard API url for querying. Defaults to None
+    #       pool_size (int, optional): Max number of pooled connections per host. Defaults to 10.
+    #       cache_dir (str, optional): Directory for the on-disk query cache. Defaults to None (no cache).
+    #       retries (int, optional): Max retries of a failed page request. Defaults to 5.
+    #       backoff (float, optional): Seconds before the first retry, doubled on every next retry up to 60. Defaults to 1.
+    #       timeout (tuple, optional): Connect and read timeout in seconds per request. Defaults to (10, 300).
+    #       checkpoint_dir (str, optional): Directory for page checkpoints so an interrupted dump resumes. Defaults to None (no checkpoints).
+    #       checkpoint_ttl (int, optional): Max age in seconds of the checkpoints of a dump, older checkpoints are discarded because the pages of the api have shifted. Defaults to one day.
     def __init__(self,
-                 api_url: str):
+                 api_url: str,
+                 pool_size: int = 10,
+                 cache_dir: str = None,
+                 retries: int = 5,
+                 backoff: float = 1,
+                 timeout: tuple = (10, 300),
+                 checkpoint_dir: str = None,
+                 checkpoint_ttl: int = 24 * 60 * 60):
         self.api_url = api_url
+        self.cache_dir = cache_dir
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_ttl = checkpoint_ttl
+        if checkpoint_dir != None:
+            self.prune_checkpoints()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     #  Function to check HTTP error from API
     #  Args: e (requests.status_codes, optional): HTTP error from API. Defaults to None
     #  Returns: Bool: return True for break in while loop.
     def http_error_check(self,
-                         e: requests.status_codes) -> bool:
-        if e.response.status_codes == 403:
+                         e: requests.HTTPError) -> bool:
+        if e.response.status_code == 403:
             print('Invalid api key')
             return True
         else:
-            print(f'Error: {e.reason}')
+            print(f'Error: {e.response.status_code} {e.response.reason}')
             return True
 
     #  Builds query url for every page with defined endpoint, filters and skip properties
@@ -81,12 +123,110 @@ class dataparser:
         request_url = self.url_builder(
             query_url, query_filter, skip_properties, page, page_size)
         try:
-            request = requests.get(
-                request_url, headers={"Accept": "application/json", "x-api-key": api_key}).json()
-            return request["result"]
+            return self.fetch_page(request_url, api_key)
         except requests.HTTPError as e:
             self.http_error_check(e)
 
+    # Request a page over the shared session, transient failures are retried with exponential backoff
+    # Args: request_url (str): Complete url of the page
+    #       api_key (str, optional): API key for identification as company. Defaults to None.
+    #       stream (bool, optional): Leave the body unread for incremental parsing. Defaults to False.
+    # Returns: requests.Response: successful response
+    def request_page(self,
+                     request_url: str,
+                     api_key: str = None,
+                     stream: bool = False) -> requests.Response:
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get(
+                    request_url, headers={"Accept": "application/json", "x-api-key": api_key}, timeout=self.timeout, stream=stream)
+                response.raise_for_status()
+                return response
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError, requests.HTTPError) as e:
+                # A failed streamed response is never read, close it so its connection goes back to the pool
+                if isinstance(e, requests.HTTPError):
+                    e.response.close()
+                if isinstance(e, requests.HTTPError) and e.response.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                    raise
+                delay = min(self.backoff * 2 ** attempt, 60)
+                metrics.increment('request_retries')
+                print(f'Retrying in {delay}s: {e}')
+                time.sleep(delay)
+
+    # Fetch a single page over the shared session and return its result list
+    # Args: request_url (str): Complete url of the page
+    #       api_key (str, optional): API key for identification as company. Defaults to None.
+    # Returns: list: result records of the page
+    def fetch_page(self,
+                   request_url: str,
+                   api_key: str = None) -> list:
+        with metrics.timer('fetch_page', request_url=request_url) as fields:
+            response = self.request_page(request_url, api_key)
+            result = response.json()['result']
+            fields['bytes'] = len(response.content)
+            fields['rows'] = len(result)
+        metrics.increment('pages_fetched')
+        metrics.increment('bytes_fetched', fields['bytes'])
+        metrics.increment('rows_fetched', fields['rows'])
+        return result
+
+    # Iterate over the result records of a single page without holding the whole response in memory.
+    # Parses the response incrementally with ijson, which is required for streaming.
+    # Args: request_url (str): Complete url of the page
+    #       api_key (str, optional): API key for identification as company. Defaults to None.
+    # Yields: dict: result record
+    def iter_page_records(self,
+                          request_url: str,
+                          api_key: str = None):
+        if ijson == None:
+            raise ImportError('Streaming needs ijson, install it with: pip install ijson')
+        with self.request_page(request_url, api_key, stream=True) as response:
+            response.raw.decode_content = True
+            yield from ijson.items(response.raw, 'result.item', use_float=True)
+            metrics.increment('bytes_fetched', response.raw.tell())
+
+    # Parse through all pages and yield the result as dataframe chunks, peak memory is bounded by chunk_size records.
+    # Streamed dumps are not checkpointed, an interrupted dump starts again at the first page.
+    # Args: api_key (str, optional): API key for identification as company. Defaults to None.
+    #       query_url (str): API endpoint for query
+    #       query_filter (str, optional): Filtering within API. Defaults to None.
+    #       skip_properties (str, optional): Properties to skip in response. Defaults to None.
+    #       page (int, optional): Starting page number. Defaults to 1.
+    #       page_size (int, optional): Default max page size. Defaults to 10000.
+    #       parse_watertypes (list, optional): Used to parse watertypes column into split columns. Defaults to False.
+    #       chunk_size (int, optional): Max number of records per yielded dataframe. Defaults to 10000.
+    # Yields: pd.DataFrame: chunk of the query result, in page order
+    def iter_data_dump(self,
+                       api_key: str,
+                       query_url: str,
+                       query_filter: str = None,
+                       skip_properties: str = None,
+                       page: int = 1,
+                       page_size: int = 1000000,
+                       parse_watertypes=False,
+                       chunk_size: int = 10000):
+
+        while True:
+            request_url = self.url_builder(
+                query_url, query_filter, skip_properties, page, page_size)
+            page_length = 0
+            chunk = []
+            for record in self.iter_page_records(request_url, api_key):
+                chunk.append(record)
+                page_length += 1
+                if len(chunk) == chunk_size:
+                    yield self.return_dataframe(chunk, parse_watertypes)
+                    chunk = []
+            if len(chunk) > 0:
+                yield self.return_dataframe(chunk, parse_watertypes)
+            metrics.increment('pages_fetched')
+            metrics.increment('rows_fetched', page_length)
+
+            if page_length < page_size:
+                return
+
+            page += 1
+
     # Parse through all pages and send to path file location as csv.
     # Args: api_key (str, optional): API key for identification as company. Defaults to None.
     #       query_url (str): API endpoint for query
@@ -95,6 +235,9 @@ class dataparser:
     #       page (int, optional): Starting page number. Defaults to 1.
     #       page_size (int, optional): Default max page size. Defaults to 10000.
     #       parse_watertypes (list, optional): Used to parse watertypes column into split columns. Defaults to False.
+    #       workers (int, optional): Number of page requests kept in flight at once, 1 while profiling. Defaults to 1.
+    #       stream (bool, optional): Parse pages incrementally with ijson, so the JSON of a whole page is never held in memory, without page checkpoints. Defaults to False.
+    #               The whole result is still returned as one dataframe, use iter_data_dump to process the chunks without holding it.
     def parse_data_dump(self,
                         api_key: str,
                         query_url: str,
@@ -102,28 +245,138 @@ class dataparser:
                         skip_properties: str = None,
                         page: int = 1,
                         page_size: int = 1000000,
-                        parse_watertypes=False):
+                        parse_watertypes=False,
+                        workers: int = 1,
+                        stream: bool = False):
 
-        json_request_list = []
+        with metrics.timer('parse_data_dump', query_url=query_url, query_filter=query_filter, workers=workers, stream=stream, pages=0, resumed_pages=0) as fields:
+            if stream:
+                # The dataframe of the whole result is built once at the end, iter_data_dump keeps memory bounded by the chunk size
+                chunks = list(self.iter_data_dump(
+                    api_key, query_url, query_filter, skip_properties, page, page_size, parse_watertypes))
+                df = pd.concat(chunks, ignore_index=True) if len(chunks) > 0 else pd.DataFrame()
+                fields['rows'] = len(df)
+                return df
 
-        while True:
-            request_url = self.url_builder(
-                query_url, query_filter, skip_properties, page, page_size)
-            try:
-                request = requests.get(
-                    request_url, headers={"Accept": "application/json", "x-api-key": api_key}).json()
-                response = request['result']
+            json_request_list = []
+            checkpoint = self.checkpoint_path(query_url, query_filter, skip_properties, page_size)
+            ended = False
+
+            # Resume after the pages completed by an interrupted dump, unless the dump started more than checkpoint_ttl seconds ago
+            if checkpoint != None and self.checkpoint_expired(checkpoint, page):
+                shutil.rmtree(checkpoint, ignore_errors=True)
+            while checkpoint != None and not ended:
+                response = self.read_checkpoint(checkpoint, page)
+                if response == None:
+                    break
                 json_request_list.extend(response)
+                fields['resumed_pages'] += 1
+                ended = self.check_ending(response, page_size)
+                page += 1
 
-                if self.check_ending(request, page_size):
-                    return self.return_dataframe(json_request_list, parse_watertypes)
+            # Keep workers pages in flight, a new page is requested as soon as the oldest one is used, results are used in page order
+            # Only the first page is requested alone, most queries fit in a single page
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                in_flight = deque()
+                window = 1
+                # cProfile only sees the calling thread, the pages are fetched there one at a time while profiling
+                submit = executor.submit
+                if profiling.is_set():
+                    workers = 1
+                    submit = self.run_inline
+                try:
+                    while not ended:
+                        while len(in_flight) < window:
+                            request_url = self.url_builder(
+                                query_url, query_filter, skip_properties, page, page_size)
+                            in_flight.append((page, submit(self.fetch_page, request_url, api_key)))
+                            page += 1
+                        response_page, future = in_flight.popleft()
+                        response = future.result()
+                        json_request_list.extend(response)
+                        fields['pages'] += 1
+                        if checkpoint != None:
+                            self.write_checkpoint(checkpoint, response_page, response)
+                        ended = self.check_ending(response, page_size)
+                        window = workers
 
-                page += 1
+                # The pages fetched so far are kept in the checkpoint for the next attempt
+                except requests.HTTPError as e:
+                    self.http_error_check(e)
+                    raise
+                # Requests past the last page are not needed
+                finally:
+                    for _, future in in_flight:
+                        future.cancel()
 
-            except requests.HTTPError as e:
-                if self.http_error_check(e):
-                    print(e)
-                    break
+            df = self.return_dataframe(json_request_list, parse_watertypes)
+            fields['rows'] = len(df)
+            if checkpoint != None:
+                shutil.rmtree(checkpoint, ignore_errors=True)
+            return df
+
+    # Run a function in the calling thread and return its outcome as a completed future, replaces the thread pool while profiling
+    @staticmethod
+    def run_inline(function, *args) -> Future:
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    # Returns the checkpoint directory of a query, None when checkpoints are disabled
+    # Args: query_url (str): API endpoint for query
+    #       query_filter (str, optional): Filtering within API. Defaults to None.
+    #       skip_properties (str, optional): Properties to skip in response. Defaults to None.
+    #       page_size (int, optional): Max page size, pages of another size do not match. Defaults to 1000000.
+    # Returns: str: path of the checkpoint directory
+    def checkpoint_path(self,
+                        query_url: str,
+                        query_filter: str = None,
+                        skip_properties: str = None,
+                        page_size: int = 1000000) -> str:
+        if self.checkpoint_dir == None:
+            return None
+        key = hashlib.sha1(f'{self.api_url}|{query_url}|{query_filter}|{skip_properties}|{page_size}'.encode()).hexdigest()
+        return os.path.join(self.checkpoint_dir, f'{query_url}_{key}')
+
+    # Write the result of a completed page to the checkpoint directory
+    def write_checkpoint(self,
+                         checkpoint: str,
+                         page: int,
+                         response: list):
+        os.makedirs(checkpoint, exist_ok=True)
+        path = os.path.join(checkpoint, f'page-{page}.json')
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(response, file)
+        os.replace(f'{path}.tmp', path)
+
+    # True when the first page of a checkpointed dump was written more than checkpoint_ttl seconds ago
+    def checkpoint_expired(self,
+                           checkpoint: str,
+                           page: int) -> bool:
+        path = os.path.join(checkpoint, f'page-{page}.json')
+        return os.path.exists(path) and time.time() - os.path.getmtime(path) > self.checkpoint_ttl
+
+    # Remove the checkpoint directories that were not written to for checkpoint_ttl seconds, e.g. of the high-water mark filter of an earlier incremental refresh
+    def prune_checkpoints(self):
+        if not os.path.isdir(self.checkpoint_dir):
+            return
+        for name in os.listdir(self.checkpoint_dir):
+            path = os.path.join(self.checkpoint_dir, name)
+            if os.path.isdir(path) and time.time() - os.path.getmtime(path) > self.checkpoint_ttl:
+                shutil.rmtree(path, ignore_errors=True)
+
+    # Returns the checkpointed result of a page, None if the page was not completed
+    def read_checkpoint(self,
+                        checkpoint: str,
+                        page: int) -> list:
+        path = os.path.join(checkpoint, f'page-{page}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as file:
+            return json.load(file)
 
     # Returns dataframe and parses watertypes column if it is in the set.
     # Args: data (list_:JSON object from aquadesk API
@@ -131,10 +384,112 @@ class dataparser:
     def return_dataframe(self,
                          json_object: list,
                          parse_watertypes: bool) -> pd.DataFrame:
-        df=pd.json_normalize(json_object)
+        with metrics.timer('return_dataframe', rows=len(json_object)):
+            df=pd.json_normalize(json_object)
         if ("watertypes" in df.columns) & (parse_watertypes == True):
             watertypes_nan_dict = {'classificationsystem': np.nan, 'watertypecode': np.nan}
             return pd.concat([df.drop("watertypes", axis=1),
                               pd.json_normalize(df["watertypes"].apply(lambda x: x[0] if isinstance(x, list) else watertypes_nan_dict))], axis=1)
         else:
-            return df
\ No newline at end of file
+            return df
+
+    # Normalise the column types of a dataframe according to a schema, columns missing from the dataframe are skipped.
+    # Args: df (pd.DataFrame): dataframe returned by return_dataframe
+    #       schema (dict): column name to 'datetime' (parsed to UTC), a pd.to_numeric downcast ('integer', 'signed', 'unsigned', 'float') or a dtype
+    #       keep_columns (list, optional): Only these columns are kept. Defaults to None (keep all).
+    # Returns: pd.DataFrame: typed dataframe
+    @staticmethod
+    def normalise_dtypes(df: pd.DataFrame,
+                         schema: dict,
+                         keep_columns: list = None) -> pd.DataFrame:
+        if keep_columns != None:
+            df = df[[column for column in keep_columns if column in df.columns]]
+        df = df.copy(deep=False)
+        for column, dtype in schema.items():
+            if column not in df.columns:
+                continue
+            if dtype == 'datetime':
+                df[column] = pd.to_datetime(df[column], errors='coerce', utc=True)
+            elif dtype in ('integer', 'signed', 'unsigned', 'float'):
+                df[column] = pd.to_numeric(df[column], errors='coerce', downcast=dtype)
+            else:
+                df[column] = df[column].astype(dtype)
+        return df
+
+    # Cast the object columns Parquet can not store, e.g. mixed int and str values of externalreference, to str. Missing values are kept.
+    # Args: df (pd.DataFrame): dataframe returned by return_dataframe
+    # Returns: pd.DataFrame: dataframe that can be written to Parquet
+    @staticmethod
+    def parquet_compatible(df: pd.DataFrame) -> pd.DataFrame:
+        import pyarrow as pa
+        for column in df.columns[df.dtypes == object]:
+            try:
+                pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+        return df
+
+    # Returns the cache file location of a query, keyed by endpoint, filter and skip properties
+    # Args: query_url (str): API endpoint for query
+    #       query_filter (str, optional): Filtering within API. Defaults to None.
+    #       skip_properties (str, optional): Properties to skip in response. Defaults to None.
+    # Returns: str: path of the parquet file
+    def cache_path(self,
+                   query_url: str,
+                   query_filter: str = None,
+                   skip_properties: str = None) -> str:
+        key = hashlib.sha1(f'{self.api_url}|{query_url}|{query_filter}|{skip_properties}'.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{query_url}_{key}.parquet')
+
+    # Returns query as dataframe from the on-disk cache and only fetches what is missing from the API.
+    # Without refresh_column the cached result is reused until it is older than ttl seconds.
+    # With refresh_column only records at or after the cached high-water mark are fetched and merged on id. Corrections
+    # and deletions of older records are only picked up by a full fetch, once the last full fetch is older than ttl seconds.
+    # The modification time of the cache file is the time of the last full fetch.
+    # Args: api_key (str, optional): API key for identification as company. Defaults to None.
+    #       query_url (str): API endpoint for query
+    #       query_filter (str, optional): Filtering within API. Defaults to None.
+    #       skip_properties (str, optional): Properties to skip in response. Defaults to None.
+    #       refresh_column (str, optional): Date column used for incremental refresh. Defaults to None.
+    #       ttl (int, optional): Max age of the cache in seconds, None never expires. Defaults to None.
+    #       **kwargs: passed on to parse_data_dump
+    # Returns: pd.DataFrame: returns dataframe of query
+    def cached_data_dump(self,
+                         api_key: str,
+                         query_url: str,
+                         query_filter: str = None,
+                         skip_properties: str = None,
+                         refresh_column: str = None,
+                         ttl: int = None,
+                         **kwargs) -> pd.DataFrame:
+        if self.cache_dir == None:
+            return self.parse_data_dump(api_key, query_url, query_filter, skip_properties, **kwargs)
+
+        path = self.cache_path(query_url, query_filter, skip_properties)
+        fetched_at = None
+        if not os.path.exists(path) or ttl != None and time.time() - os.path.getmtime(path) > ttl:
+            df = self.parse_data_dump(api_key, query_url, query_filter, skip_properties, **kwargs)
+        else:
+            cached = pd.read_parquet(path)
+            if refresh_column != None and refresh_column in cached.columns and len(cached) > 0:
+                fetched_at = os.path.getmtime(path)
+                high_water_mark = str(cached[refresh_column].max())[:10]
+                refresh_filter = f'{refresh_column}:ge:"{high_water_mark}"'
+                if query_filter != None:
+                    refresh_filter = f'{query_filter};{refresh_filter}'
+                new = self.parse_data_dump(api_key, query_url, refresh_filter, skip_properties, **kwargs)
+                df = pd.concat([cached, new], ignore_index=True)
+                if 'id' in df.columns:
+                    df = df.drop_duplicates(subset='id', keep='last', ignore_index=True)
+            else:
+                return cached
+
+        # Write to a temporary file first so an interrupted write never leaves a broken cache
+        os.makedirs(self.cache_dir, exist_ok=True)
+        df = self.parquet_compatible(df)
+        df.to_parquet(f'{path}.tmp', index=False)
+        os.replace(f'{path}.tmp', path)
+        # An incremental refresh keeps the time of the last full fetch
+        if fetched_at != None:
+            os.utime(path, (fetched_at, fetched_at))
+        return df
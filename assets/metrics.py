@@ -0,0 +1,90 @@
+import cProfile
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+#---------------------------------------------
+# File: metrics.py
+# Author: Wouter Abels (wouter.abels@rws.nl)
+# Created: 18/10/26
+# Last modified: 18/10/26
+# Python ver: 3.9.7
+#---------------------------------------------
+
+logger = logging.getLogger('macev.metrics')
+
+### Collects stage timings and counters of the load pipeline and the dashboard ###
+class Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+
+    # Add value to a counter
+    # Args: name (str): Counter name, e.g. 'pages_fetched'
+    #       value (int, optional): Amount to add. Defaults to 1.
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # Record the duration of a stage and log it as a JSON line with the extra fields
+    # Args: stage (str): Stage name, e.g. 'parse_data_dump'
+    #       seconds (float): Duration of the stage
+    #       **fields: extra information of the stage, e.g. rows or query_url
+    def record(self, stage, seconds, **fields):
+        with self._lock:
+            timer = self.timers.setdefault(stage, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'last_seconds': 0.0})
+            timer['count'] += 1
+            timer['total_seconds'] += seconds
+            timer['max_seconds'] = max(timer['max_seconds'], seconds)
+            timer['last_seconds'] = seconds
+        logger.info(json.dumps(dict({'stage': stage, 'seconds': round(seconds, 6)}, **fields), default=str))
+
+    # Time the enclosed block as a stage, the yielded dict can be filled with extra fields to log
+    @contextmanager
+    def timer(self, stage, **fields):
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.record(stage, time.perf_counter() - start, **fields)
+
+    # Returns a copy of all timers and counters
+    def as_dict(self):
+        with self._lock:
+            return {'timers': {stage: dict(timer) for stage, timer in self.timers.items()}, 'counters': dict(self.counters)}
+
+    def reset(self):
+        with self._lock:
+            self.timers = {}
+            self.counters = {}
+
+
+# Metrics of this process
+metrics = Metrics()
+
+
+# Set while a profile block runs, the thread pools of the load pipeline then run serially
+profiling = threading.Event()
+
+
+# Profile the enclosed block with cProfile and write the stats to path, does nothing when path is None
+# cProfile only sees the calling thread, so the load pipeline runs its queries and pages serially while profiling
+@contextmanager
+def profile(path=None):
+    if path == None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiling.set()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiling.clear()
+        profiler.dump_stats(path)
+        logger.info(json.dumps({'stage': 'profile', 'path': path}))
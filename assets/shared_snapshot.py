@@ -0,0 +1,88 @@
+import json
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+
+#---------------------------------------------
+# File: shared_snapshot.py
+# Author: Wouter Abels (wouter.abels@rws.nl)
+# Created: 18/10/26
+# Last modified: 18/10/26
+# Python ver: 3.9.7
+#---------------------------------------------
+
+### Read-only data snapshot published as Arrow files, shared by all dashboard worker processes ###
+# The parent process publishes the aggregates of a DataSnapshot, the workers read the files through a memory map.
+# The file pages are shared through the OS page cache, but every worker converts the aggregates to its own pandas
+# copy, which is small because only the cube and the totals are published. historic_and_data is not published.
+class SharedSnapshot:
+
+    # Initialize with the directory of the snapshot files
+    # Args: directory (str): Directory the snapshot is published to and attached from
+    def __init__(self, directory):
+        self.directory = directory
+        self.attached_id = None
+
+    # Write a table as Arrow IPC file, first to a temporary file so readers never see a partial file
+    def write_table(self, table, name):
+        path = os.path.join(self.directory, name)
+        with pa.OSFile(f'{path}.tmp', 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(f'{path}.tmp', path)
+
+    # Memory-map an Arrow IPC file, the returned table references the mapped pages without copying
+    def read_table(self, name):
+        source = pa.memory_map(os.path.join(self.directory, name), 'r')
+        return pa.ipc.open_file(source).read_all()
+
+    # Publish the aggregates of a snapshot and point current.json at them, older snapshots except the previous one are removed
+    # Args: snapshot (DataSnapshot): Snapshot of a DataRefresher
+    def publish(self, snapshot):
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot_id = f'{snapshot.version}-{int(time.time() * 1000)}'
+        self.write_table(pa.Table.from_pandas(snapshot.cube.reset_index()), f'snapshot-{snapshot_id}-cube.arrow')
+        # Arrow can not restore categorical column labels, the taxongroup labels are stored as plain strings
+        total_plot_data = snapshot.total_plot_data.set_axis(pd.Index(snapshot.total_plot_data.columns.astype(str), name='Taxongroup'), axis=1)
+        self.write_table(pa.Table.from_pandas(total_plot_data), f'snapshot-{snapshot_id}-total.arrow')
+
+        current = os.path.join(self.directory, 'current.json')
+        previous_id = self.current()['id'] if os.path.exists(current) else None
+        with open(f'{current}.tmp', 'w') as file:
+            json.dump({
+                'id': snapshot_id,
+                'loaded_at': snapshot.loaded_at.isoformat(),
+                'unique_measurementobject': [str(object) for object in snapshot.unique_measurementobject],
+                'macev_taxongroup_colours': snapshot.macev_taxongroup_colours,
+                }, file)
+        os.replace(f'{current}.tmp', current)
+
+        # Workers that still map a removed file keep reading it until they attach the new snapshot
+        for name in os.listdir(self.directory):
+            if name.startswith('snapshot-') and not name.startswith((f'snapshot-{snapshot_id}-', f'snapshot-{previous_id}-')):
+                os.remove(os.path.join(self.directory, name))
+
+    # Returns the metadata of the published snapshot
+    def current(self):
+        with open(os.path.join(self.directory, 'current.json')) as file:
+            return json.load(file)
+
+    # True when a snapshot was published after the last attach
+    def changed(self):
+        try:
+            return self.current()['id'] != self.attached_id
+        except FileNotFoundError:
+            return False
+
+    # Attach to the published snapshot, returns the same values as DataValidation.plotly_data so it can feed a DataRefresher
+    # The aggregates are copied out of the mapped files by to_pandas
+    def plotly_data(self):
+        current = self.current()
+        cube = self.read_table(f'snapshot-{current["id"]}-cube.arrow')\
+            .to_pandas()\
+            .set_index(['measurementobjectname', 'year', 'name_tg'])['calculatedvalue']
+        total_plot_data = self.read_table(f'snapshot-{current["id"]}-total.arrow').to_pandas()
+        unique_measurementobject = pd.Index(current['unique_measurementobject']).to_numpy()
+        self.attached_id = current['id']
+        return total_plot_data, current['macev_taxongroup_colours'], unique_measurementobject, None, cube
@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+#---------------------------------------------
+# File: fake_ddecoapi.py
+# Author: Wouter Abels (wouter.abels@rws.nl)
+# Created: 18/10/26
+# Last modified: 18/10/26
+# Python ver: 3.9.7
+#---------------------------------------------
+
+### Request handler answering paginated DD-ECO api queries from the datasets of the server ###
+class FakeDDEcoApiHandler(BaseHTTPRequestHandler):
+
+    # Comparison operators of the DD-ECO filter syntax
+    operators = {
+        'eq': lambda column, value: column == value,
+        'ne': lambda column, value: column != value,
+        'gt': lambda column, value: column > value,
+        'ge': lambda column, value: column >= value,
+        'lt': lambda column, value: column < value,
+        'le': lambda column, value: column <= value,
+        }
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = url.path.rstrip('/').split('/')[-1]
+        query = parse_qs(url.query)
+        dataset = self.server.datasets.get(endpoint)
+        if dataset is None:
+            self.send_error(404)
+            return
+        if self.server.api_key != None and self.headers.get('x-api-key') != self.server.api_key:
+            self.send_error(403)
+            return
+
+        time.sleep(self.server.latency)
+        page = int(query.get('page', ['1'])[0])
+        page_size = int(query.get('pagesize', ['10000'])[0])
+        dataset = self.apply_filter(dataset, query.get('filter', [None])[0])
+        skip_properties = query.get('skipproperties', [''])[0].split(',')
+        result = dataset.iloc[(page - 1) * page_size:page * page_size]
+        result = result.drop(columns=[column for column in skip_properties if column in result.columns])
+
+        body = '{"paging":' + json.dumps({
+            'offset': (page - 1) * page_size,
+            'limit': page_size,
+            'totalObjectCount': len(dataset),
+            'moreData': page * page_size < len(dataset),
+            }) + ',"result":' + result.to_json(orient='records') + '}'
+        body = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Filter the dataset with a DD-ECO filter, e.g. 'measurementdate:ge:"2021-04-01";taxontype:eq:"MACEV"'
+    def apply_filter(self, dataset, query_filter):
+        if query_filter == None:
+            return dataset
+        for part in query_filter.split(';'):
+            column, operator, value = part.split(':', 2)
+            if column not in dataset.columns:
+                continue
+            value = value.strip('"\'')
+            dataset = dataset[self.operators[operator](dataset[column], value)]
+        return dataset
+
+    def log_message(self, format, *args):
+        pass
+
+
+### Local stand-in of the DD-ECO api serving synthetic datasets ###
+class FakeDDEcoApi(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # Initialize server
+    # Args: datasets (dict): endpoint name to dataframe of records
+    #       latency (float, optional): Seconds of delay added to every request. Defaults to 0.
+    #       api_key (str, optional): Required x-api-key header, None accepts every request. Defaults to None.
+    #       port (int, optional): Port to listen on, 0 picks a free port. Defaults to 0.
+    def __init__(self, datasets, latency=0, api_key=None, port=0):
+        super().__init__(('127.0.0.1', port), FakeDDEcoApiHandler)
+        self.datasets = datasets
+        self.latency = latency
+        self.api_key = api_key
+        self._thread = None
+
+    # Base url to use as api_url of dataparser and DataValidation
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/v2/'
+
+    # Serve in a daemon thread
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-ddecoapi', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,137 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from assets.ddecoapidataparser import dataparser, ijson
+from assets.data_validation import DataValidation
+from assets.metrics import metrics
+from benchmarks.fake_ddecoapi import FakeDDEcoApi
+from benchmarks.synthetic_data import SyntheticData
+
+#---------------------------------------------
+# File: run_benchmarks.py
+# Author: Wouter Abels (wouter.abels@rws.nl)
+# Created: 18/10/26
+# Last modified: 18/10/26
+# Python ver: 3.9.7
+#
+# Times the load pipeline and the dashboard callbacks against a local fake DD-ECO api with synthetic data,
+# results are written as JSON lines. Run from the repository root:
+#   python -m benchmarks.run_benchmarks --records 100000 1000000 --output bench_output.txt
+#---------------------------------------------
+
+# Run a function repeat times and return the timings in seconds and the result of the last run
+def timed(function, repeat=1):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+    return seconds, result
+
+
+# Time all scenarios for one dataset size
+# Args: server (FakeDDEcoApi): Running fake api of which the datasets are replaced
+#       records (int): Number of synthetic measurements
+#       args (argparse.Namespace): Command line arguments
+# Returns: list: result dict per scenario
+def run_size(server, records, args):
+    server.datasets = SyntheticData(args.seed).datasets(records, objects=args.objects)
+    results = []
+
+    def result(scenario, seconds, **extra):
+        results.append(dict({
+            'scenario': scenario,
+            'records': records,
+            'objects': args.objects,
+            'latency': args.latency,
+            'page_size': args.page_size,
+            'min_seconds': min(seconds),
+            'mean_seconds': sum(seconds) / len(seconds),
+            'runs': len(seconds),
+            }, **extra))
+
+    # Paginated download of all measurements, serial, with pages in flight and streaming (needs ijson)
+    ddecoapi = dataparser(server.url)
+    scenarios = [('parse_data_dump', {}), ('parse_data_dump_workers', {'workers': args.workers})]
+    if ijson != None:
+        scenarios.append(('parse_data_dump_stream', {'stream': True}))
+    for name, kwargs in scenarios:
+        seconds, df = timed(lambda: ddecoapi.parse_data_dump(api_key=None, query_url='measurements', query_filter='taxontype:eq:"MACEV"', page_size=args.page_size, **kwargs), args.repeat)
+        result(name, seconds, rows=len(df), **kwargs)
+
+    # Full and lean load and check of the data, with the bytes downloaded per run
+    for name, lean in [('data_check', False), ('data_check_lean', True)]:
+        data_validation = DataValidation(api_url=server.url, lean=lean, page_size=args.page_size)
+        bytes_fetched = metrics.counters.get('bytes_fetched', 0)
+        seconds, checked = timed(data_validation.data_check, args.repeat)
+        historic_and_data = checked[1]
+        result(name, seconds, rows=len(historic_and_data), bytes=(metrics.counters.get('bytes_fetched', 0) - bytes_fetched) // args.repeat)
+
+    seconds, _ = timed(lambda: data_validation.value_per_year(historic_and_data), args.repeat)
+    result('value_per_year', seconds)
+
+    # Lean load of a range of years, only those years may be loaded
+    data_validation = DataValidation(api_url=server.url, lean=True, page_size=args.page_size, first_year=args.first_year, last_year=args.last_year)
+    bytes_fetched = metrics.counters.get('bytes_fetched', 0)
+    seconds, checked = timed(data_validation.data_check, args.repeat)
+    years = sorted(int(year) for year in checked[1]['year'].unique())
+    assert all(args.first_year <= year <= args.last_year for year in years), f'data_check_lean_years loaded years {years} outside {args.first_year}-{args.last_year}'
+    result('data_check_lean_years', seconds, rows=len(checked[1]), years=years, bytes=(metrics.counters.get('bytes_fetched', 0) - bytes_fetched) // args.repeat)
+
+    # Dashboard callbacks on a freshly loaded snapshot, first (uncached) and repeated (cached) views
+    app = importlib.import_module('API_Dash_graphs')
+    app.refresher.data_validation = DataValidation(api_url=server.url, lean=True, page_size=args.page_size)
+    seconds, _ = timed(app.refresher.refresh)
+    result('snapshot_refresh', seconds)
+    snapshot = app.refresher.snapshot
+    objects = list(snapshot.unique_measurementobject)
+    for mode in ['Totale Abundantie', 'Relatieve Abundantie']:
+        seconds, _ = timed(lambda: app.graph_total_update(mode, snapshot.version))
+        result('graph_total_update', seconds, mode=mode, cached=False)
+        seconds, _ = timed(lambda: app.graph_total_update(mode, snapshot.version), args.repeat)
+        result('graph_total_update', seconds, mode=mode, cached=True)
+        seconds = [timed(lambda: app.graph_object_update(object, mode, snapshot.version))[0][0] for object in objects]
+        result('graph_object_update', seconds, mode=mode, cached=False)
+        seconds = [timed(lambda: app.graph_object_update(object, mode, snapshot.version))[0][0] for object in objects]
+        result('graph_object_update', seconds, mode=mode, cached=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the MACEV data pipeline and dashboard callbacks against a local fake DD-ECO api.')
+    parser.add_argument('--records', type=int, nargs='+', default=[100000], help='Numbers of synthetic measurements to benchmark')
+    parser.add_argument('--objects', type=int, default=50, help='Number of measurementobjects')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of latency added to every api request')
+    parser.add_argument('--page-size', type=int, default=100000, help='Page size of the api requests of all scenarios')
+    parser.add_argument('--first-year', type=int, default=2016, help='First year of the data_check_lean_years scenario')
+    parser.add_argument('--last-year', type=int, default=2018, help='Last year of the data_check_lean_years scenario')
+    parser.add_argument('--workers', type=int, default=4, help='Pages in flight for the parse_data_dump_workers scenario')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+    parser.add_argument('--output', help='File to append the JSON lines to, defaults to stdout')
+    args = parser.parse_args(argv)
+
+    server = FakeDDEcoApi({}, latency=args.latency).start()
+    # The dashboard module loads its data at import, point it at the fake api without the on-disk cache
+    os.environ['DDECOAPI_URL'] = server.url
+    os.environ['MACEV_CACHE_DIR'] = ''
+    run = {'started': datetime.now().isoformat(), 'python': platform.python_version()}
+    output = open(args.output, 'a') if args.output else sys.stdout
+    try:
+        for records in args.records:
+            for result in run_size(server, records, args):
+                output.write(json.dumps(dict(run, **result)) + '\n')
+                output.flush()
+    finally:
+        server.stop()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from assets.data_validation import DataValidation
+
+#---------------------------------------------
+# File: synthetic_data.py
+# Author: Wouter Abels (wouter.abels@rws.nl)
+# Created: 18/10/26
+# Last modified: 18/10/26
+# Python ver: 3.9.7
+#---------------------------------------------
+
+### Generates synthetic MACEV data in the shape of the DD-ECO api responses ###
+class SyntheticData:
+
+    # Initialize generator
+    # Args: seed (int, optional): Seed of the random generator. Defaults to 0.
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+
+    # Taxongroups, one per colour of the dashboard
+    # Returns: pd.DataFrame: taxongroups endpoint records
+    def taxongroups(self):
+        names = list(DataValidation().set_data_colours().keys())
+        return pd.DataFrame({
+            'code': [f'TG{i:02d}' for i in range(len(names))],
+            'name': names,
+            'maintypename': 'Macrofauna',
+            'changedate': '2021-01-01T00:00:00',
+            'externalkey': None,
+            })
+
+    # TWN taxa spread over the taxongroups, with synonyms and species that have a parent genus
+    # Args: taxa (int, optional): Number of taxa. Defaults to 2000.
+    # Returns: pd.DataFrame: parameters endpoint records
+    def parameters(self, taxa=2000):
+        names = np.array([f'Taxon {i}' for i in range(taxa)], dtype=object)
+        synonym = self.rng.random(taxa) < 0.05
+        ranks = self.rng.choice(['Species', 'SpeciesCombi', 'Genus', 'Familia'], size=taxa, p=[0.6, 0.05, 0.25, 0.1])
+        return pd.DataFrame({
+            'name': names,
+            'code': [f'T{i}' for i in range(taxa)],
+            'taxongroup': self.rng.choice(self.taxongroups()['code'], size=taxa),
+            'statuscode': np.where(synonym, 20, 10),
+            'synonymname': np.where(synonym, self.rng.choice(names, size=taxa), None),
+            'taxonrank': ranks,
+            'parentname': [f'Genus {i // 10}' for i in range(taxa)],
+            'parametertype': 'TAXON',
+            'taxontype': 'MACEV',
+            'changedate': '2021-01-01T00:00:00',
+            })
+
+    # Counted MACEV measurements of a number of measurementobjects over a range of years
+    # Args: records (int): Number of measurements
+    #       objects (int, optional): Number of measurementobjects. Defaults to 50.
+    #       taxa (int, optional): Number of taxa the parameters are drawn from. Defaults to 2000.
+    #       first_year (int, optional): First collection year. Defaults to 2015.
+    #       last_year (int, optional): Last collection year. Defaults to 2022.
+    # Returns: pd.DataFrame: measurements endpoint records
+    def measurements(self, records, objects=50, taxa=2000, first_year=2015, last_year=2022):
+        object_numbers = self.rng.integers(0, objects, size=records)
+        start = np.datetime64(f'{first_year}-01-01')
+        days = (np.datetime64(f'{last_year + 1}-01-01') - start).astype(int)
+        dates = np.datetime_as_string(start + self.rng.integers(0, days, size=records).astype('timedelta64[D]'))
+        dates = np.char.add(dates.astype(str), 'T00:00:00')
+        measuredvalue = self.rng.geometric(0.05, size=records).astype(float)
+        limitsymbol = np.where(self.rng.random(records) < 0.01, '>', None)
+        measuredvalue[limitsymbol == '>'] = 0.0
+        return pd.DataFrame({
+            'id': np.arange(records),
+            'externalreference': self.rng.integers(0, records // 20 + 1, size=records),
+            'measurementobject': np.char.add('OBJ', object_numbers.astype(str)),
+            'measurementobjectname': np.char.add('Meetobject ', object_numbers.astype(str)),
+            'collectiondate': dates,
+            'measurementdate': dates,
+            'parameter': np.char.add('Taxon ', self.rng.integers(0, taxa, size=records).astype(str)),
+            'limitsymbol': limitsymbol,
+            'measuredvalue': measuredvalue,
+            'calculatedvalue': measuredvalue,
+            'measurementsetnumber': self.rng.integers(0, 1000, size=records),
+            'measurementpackage': 'ME.AT',
+            'taxontype': 'MACEV',
+            'quantity': 'AANTAL',
+            'calculatedunit': 'n',
+            'measuredunit': 'n',
+            'changedate': dates,
+            'organisation': 'RWS',
+            'sourcesystem': 'synthetic',
+            })
+
+    # All datasets of the fake api
+    # Args: records (int): Number of measurements
+    #       **kwargs: passed on to measurements
+    # Returns: dict: endpoint to dataframe of records
+    def datasets(self, records, **kwargs):
+        return {
+            'measurements': self.measurements(records, **kwargs),
+            'parameters': self.parameters(kwargs.get('taxa', 2000)),
+            'taxongroups': self.taxongroups(),
+            }
@@ -0,0 +1,83 @@
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+from assets.data_validation import DataValidation
+from assets.data_refresher import DataRefresher
+from assets.metrics import metrics
+from assets.shared_snapshot import SharedSnapshot
+
+#---------------------------------------------
+# File: serve.py
+# Author: Wouter Abels (wouter.abels@rws.nl)
+# Created: 18/10/26
+# Last modified: 18/10/26
+# Python ver: 3.9.7
+#
+# Production entry point of the dashboard. The data is loaded and aggregated once, published as a shared
+# snapshot and served by gunicorn workers that attach to it. A publisher process refreshes the snapshot.
+#   python serve.py --workers 8 --bind 0.0.0.0:8050
+#---------------------------------------------
+
+# Build the pipeline the same way as API_Dash_graphs does for a single process
+def data_validation(args):
+    return DataValidation(cache_dir=os.environ.get('MACEV_CACHE_DIR', 'cache') or None, api_url=os.environ.get('DDECOAPI_URL', 'https://ddecoapi.aquadesk.nl/v2/'), lean=True, first_year=args.first_year, last_year=args.last_year)
+
+
+# Reload the data every refresh_interval seconds and publish every new snapshot, runs in its own process (--publish-only)
+def publish_loop(args):
+    refresher = DataRefresher(data_validation(args), interval=args.refresh_interval, on_refresh=SharedSnapshot(args.snapshot_dir).publish)
+    refresher.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the MACEV dashboard with several gunicorn workers sharing one data snapshot.')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='Number of gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker')
+    parser.add_argument('--bind', default='0.0.0.0:8050', help='Address to listen on')
+    parser.add_argument('--snapshot-dir', default='snapshot', help='Directory of the shared data snapshot')
+    parser.add_argument('--refresh-interval', type=int, default=6 * 60 * 60, help='Seconds between data refreshes')
+    parser.add_argument('--first-year', type=int, default=2015, help='First year of the loaded data')
+    parser.add_argument('--last-year', type=int, default=None, help='Last year of the loaded data')
+    parser.add_argument('--publish-only', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.publish_only:
+        publish_loop(args)
+        return
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit('serve.py needs gunicorn, install it with: pip install gunicorn')
+
+    # Load and publish once before any worker starts, the workers only attach to the published files
+    refresher = DataRefresher(data_validation(args), on_refresh=SharedSnapshot(args.snapshot_dir).publish)
+    if not refresher.refresh():
+        sys.exit('Initial data load failed')
+    del refresher
+    os.environ['MACEV_SNAPSHOT_DIR'] = args.snapshot_dir
+
+    # The publisher is a separate interpreter, not a fork, so the gunicorn workers do not inherit it
+    publisher = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--publish-only'] + (argv if argv != None else sys.argv[1:]))
+
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', args.bind)
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('on_exit', lambda arbiter: publisher.terminate())
+            # Workers are forked from this process, /metrics of a worker only counts its own work
+            self.cfg.set('post_fork', lambda arbiter, worker: metrics.reset())
+
+        # Imported in every worker, attaches to the shared snapshot
+        def load(self):
+            from API_Dash_graphs import server
+            return server
+
+    DashboardApplication().run()
+
+
+if __name__ == '__main__':
+    main()